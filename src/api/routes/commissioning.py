@@ -3,7 +3,9 @@ API Routes - Commissioning
 Endpoints para añadir (comisionar) nuevos dispositivos Matter.
 """
 
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, Field
 from loguru import logger
 
@@ -12,6 +14,19 @@ from dependencies import get_controller
 
 router = APIRouter()
 
+# Referencias a los comisionamientos en curso para que el GC no los cancele
+_inflight_tasks = set()
+
+
+def _on_commissioning_done(task: asyncio.Task):
+    """Registra el resultado de un comisionamiento lanzado en segundo plano."""
+    _inflight_tasks.discard(task)
+    if task.cancelled():
+        logger.warning("Comisionamiento cancelado")
+    elif task.exception():
+        logger.opt(exception=task.exception()).error("❌ Error durante el comisionamiento")
+
+
 # ========== MODELO PYDANTIC ==========
 
 
@@ -31,7 +46,6 @@ class CommissionRequest(BaseModel):
 @router.post("/start")
 async def start_commissioning(
     request: CommissionRequest,
-    background_tasks: BackgroundTasks,
     controller: MatterController = Depends(get_controller),
 ):
     """
@@ -51,8 +65,10 @@ async def start_commissioning(
         )
 
         # El comisionamiento puede tardar, así que lo ejecutamos en segundo plano
-        # para no bloquear la API.
-        background_tasks.add_task(controller.commission_device, request.setup_code)
+        # para no bloquear la API. Varios comisionamientos pueden ir en paralelo.
+        task = asyncio.create_task(controller.commission_device(request.setup_code))
+        _inflight_tasks.add(task)
+        task.add_done_callback(_on_commissioning_done)
 
         return {
             "success": True,
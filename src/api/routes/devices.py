@@ -3,14 +3,13 @@ API Routes - Dispositivos
 Endpoints para listar, controlar y gestionar dispositivos Matter
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from pydantic import BaseModel, Field
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from loguru import logger
 
 from matter.controller import MatterController
 from dependencies import get_controller  # ← Importamos la función del main
-from storage.database import get_database
 
 router = APIRouter()
 
@@ -25,33 +24,90 @@ class CommandRequest(BaseModel):
     params: Dict = Field(default_factory=dict, description="Parámetros adicionales")
 
 
+class DeviceOut(BaseModel):
+    """Resumen de un dispositivo"""
+
+    node_id: int
+    name: str
+    type: str
+    online: bool
+    endpoint: int
+
+
+class DeviceDetailOut(DeviceOut):
+    """Dispositivo con su estado completo"""
+
+    state: Dict
+
+
+class BatchCommandItem(CommandRequest):
+    """Comando dirigido a un dispositivo concreto dentro de un lote"""
+
+    node_id: int = Field(..., description="ID del nodo destino")
+
+
+class BatchCommandRequest(BaseModel):
+    """Request para enviar varios comandos en una sola llamada"""
+
+    items: List[BatchCommandItem] = Field(..., description="Comandos a enviar")
+
+
 # ========== ENDPOINTS ==========
 
 
-@router.get("/")
+@router.get("/", response_model=List[DeviceOut])
 async def list_devices(controller: MatterController = Depends(get_controller)):
     """
     Listar todos los dispositivos comisionados.
     """
     try:
-        devices = controller.list_devices()
-
-        return [
-            {
-                "node_id": device.node_id,
-                "name": device.name,
-                "type": device.device_type,
-                "online": device.is_online,
-                "endpoint": device.endpoint_id,
-            }
-            for device in devices
-        ]
+        # JSON ya serializado: se reconstruye solo cuando cambia algún dispositivo
+        # max-age=1: una UI que sondea a 1 Hz reutiliza la respuesta del navegador
+        return Response(
+            content=controller.list_devices_json(),
+            media_type="application/json",
+            headers={"Cache-Control": "max-age=1"},
+        )
     except Exception as e:
         logger.error(f"Error listando dispositivos: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/{node_id}")
+@router.post("/commands:batch")
+async def send_commands_batch(
+    request: BatchCommandRequest,
+    controller: MatterController = Depends(get_controller),
+):
+    """
+    Enviar comandos a varios dispositivos a la vez.
+
+    Los comandos se ejecutan en paralelo y cada uno informa de su propio
+    resultado, de modo que un fallo no cancela el resto.
+
+    Ejemplo:
+        {"items": [
+            {"node_id": 1, "command": "off"},
+            {"node_id": 2, "command": "level", "params": {"level": 30}}
+        ]}
+    """
+    try:
+        results = await controller.send_commands_batch(
+            [(item.node_id, item.command, item.params) for item in request.items]
+        )
+
+        return {
+            "success": all(result["success"] for result in results),
+            "results": results,
+        }
+
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error enviando lote de comandos: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{node_id}", response_model=DeviceDetailOut)
 async def get_device(
     node_id: int, controller: MatterController = Depends(get_controller)
 ):
@@ -115,8 +171,10 @@ async def send_command(
         }
 
     except ValueError as e:
-        print(e)
+        logger.warning(f"Comando no válido para {node_id}: {e}")
         raise HTTPException(status_code=404, detail=str(e))
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error enviando comando: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -132,7 +190,6 @@ async def update_device(
     Actualizar nombre del dispositivo.
     """
     try:
-        db = get_database()
         if node_id not in controller.devices:
             raise HTTPException(
                 status_code=404, detail=f"Dispositivo {node_id} no encontrado"
@@ -141,10 +198,10 @@ async def update_device(
         device = controller.devices[node_id]
 
         if name:
-            device.name = name
+            device = controller.rename_device(node_id, name)
             logger.info(f"Dispositivo {node_id} renombrado a: {name}")
 
-        db.save_device(device)  # Guardar cambios
+        controller.save_device(device)  # Guardar cambios en segundo plano
         return {
             "success": True,
             "device": {
@@ -168,14 +225,19 @@ async def remove_device(
 ):
     """
     Eliminar dispositivo del sistema.
+
+    Responde en cuanto el servidor Matter recibe la petición; el dispositivo
+    desaparece de la lista cuando el servidor confirma la eliminación.
     """
     try:
         await controller.remove_device(node_id)
 
-        return {"success": True, "message": f"Dispositivo {node_id} eliminado"}
+        return {"success": True, "message": f"Eliminación del dispositivo {node_id} solicitada"}
 
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error eliminando dispositivo: {e}")
         raise HTTPException(status_code=500, detail=str(e))
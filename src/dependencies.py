@@ -6,5 +6,6 @@ def set_controller(controller):
     _controller = controller
 
 
-def get_controller():
+async def get_controller():
+    # async para que FastAPI no la despache al threadpool en cada request
     return _controller
@@ -3,24 +3,43 @@ MatterCenter - Servidor Principal
 Punto de entrada de la aplicación
 """
 
+import asyncio
 import os
+import sys
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 from dotenv import load_dotenv
 from dependencies import get_controller, set_controller
-from storage.database import init_database, get_database
+from storage.database import Database, init_database
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Logs escritos desde un hilo aparte para no bloquear el event loop
+logger.remove()
+logger.add(sys.stderr, enqueue=True)
+
 # Importar el controlador Matter (lo crearemos después)
 from matter.controller import MatterController
 
 # Variable global para el controlador
 matter_controller = None
 
+# Cada cuánto se liberan páginas libres de la base de datos (segundos)
+DB_MAINTENANCE_INTERVAL = float(os.getenv("DB_MAINTENANCE_INTERVAL", "300"))
+
+
+async def database_maintenance(db: Database):
+    """Tarea periódica: vacuum incremental de la base de datos en un hilo."""
+    while True:
+        await asyncio.sleep(DB_MAINTENANCE_INTERVAL)
+        try:
+            await asyncio.to_thread(db.vacuum)
+        except Exception as e:
+            logger.warning(f"⚠️ Error en el mantenimiento de la base de datos: {e}")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -36,11 +55,12 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 Iniciando MatterCenter...")
 
     db_path = os.getenv("DATABASE_PATH", "data/mattercenter.db")
-    init_database(db_path)
+    db = init_database(db_path)
     logger.success("💾 Base de datos inicializada")
+    maintenance_task = asyncio.create_task(database_maintenance(db))
 
     # Crear e inicializar el controlador Matter
-    matter_controller = MatterController()
+    matter_controller = MatterController(db)
     await matter_controller.initialize()
     set_controller(matter_controller)  # ← Configuramos la dependencia
 
@@ -55,9 +75,9 @@ async def lifespan(app: FastAPI):
         await matter_controller.shutdown()
 
     # Cerrar base de datos
+    maintenance_task.cancel()
     try:
-        db = get_database()
-        db.close()
+        await db.aclose()
     except:
         pass
 
@@ -72,10 +92,17 @@ app = FastAPI(
     lifespan=lifespan,  # Conectar el lifecycle
 )
 
-# CORS - Permitir peticiones desde cualquier origen (ajustar en producción)
+# CORS - Orígenes permitidos separados por comas en CORS_ORIGINS.
+# Con una lista explícita la cabecera Access-Control-Allow-Origin es estática
+# y las respuestas se pueden cachear. Por defecto se permite cualquier origen.
+cors_origins = [
+    origin.strip()
+    for origin in os.getenv("CORS_ORIGINS", "*").split(",")
+    if origin.strip()
+]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -94,19 +121,12 @@ async def root():
 @app.get("/health")
 async def health():
     """Estado detallado del sistema"""
-    matter_controller = get_controller()
+    matter_controller = await get_controller()
 
     if not matter_controller:
         return {"status": "initializing"}
 
-    return {
-        "status": "healthy",
-        "devices_count": len(matter_controller.devices),
-        "devices": [
-            {"node_id": device.node_id, "name": device.name, "online": device.is_online}
-            for device in matter_controller.devices.values()
-        ],
-    }
+    return Response(content=matter_controller.health_json(), media_type="application/json")
 
 
 ## ========== IMPORTAR Y REGISTRAR RUTAS ==========
@@ -131,6 +151,14 @@ if __name__ == "__main__":
     logger.info(f"🌐 Iniciando servidor en http://localhost:{port}")
     logger.info(f"📚 Documentación en http://localhost:{port}/docs")
 
+    # Un solo worker: cada proceso abriría su propia conexión con el
+    # Matter Server y tendría su propia copia de los dispositivos.
     uvicorn.run(
-        "main:app", host="0.0.0.0", port=port, reload=debug  # Hot-reload en desarrollo
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        reload=debug,  # Hot-reload en desarrollo
+        workers=1,
+        # uvloop (libuv) acelera el event loop que mueve todo el tráfico WebSocket
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
     )
@@ -4,22 +4,111 @@ Implementación como cliente para un `python-matter-server` a través de WebSock
 """
 
 import asyncio
-import json
-import time
-from typing import Dict, Optional, List
+import itertools
+import sys
+from typing import Dict, Optional, List, Set, Tuple
 from dataclasses import dataclass, field
 import websockets
-from websockets.protocol import State
-from websockets.client import WebSocketClientProtocol
+from websockets.asyncio.client import ClientConnection
 from websockets.exceptions import ConnectionClosed, WebSocketException
 from loguru import logger
 import os
 
-from storage.database import get_database
+from storage.database import Database
+
+# orjson si está disponible; si no, json de la librería estándar.
+# Ambos alias devuelven/aceptan bytes para que el resto del módulo no cambie.
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    import json
+
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    _loads = json.loads
+
+
+# URL del python-matter-server. Se resuelve al importar el módulo, así que
+# main.py carga el .env antes de importar el controlador.
+_MATTER_SERVER_URL = "ws://{}:{}/ws".format(
+    os.getenv("MATTER_SERVER_HOST", "localhost"),
+    os.getenv("MATTER_SERVER_PORT", "5580"),
+)
+
+# Credenciales Wi-Fi que se entregan al servidor para comisionar dispositivos
+_WIFI_CREDENTIALS = {
+    "ssid": "NOMBRE DEL WIFI",
+    "credentials": "CONTRASEÑA1234",
+}
+
+# Comandos de la API sin parámetros -> comando del servidor
+_STATIC_COMMANDS = {
+    "on": "on_off.on",
+    "off": "on_off.off",
+    "toggle": "on_off.toggle",
+}
+# Parámetros compartidos por los comandos estáticos. No modificar.
+_NO_PARAMS: Dict = {}
+
+# Segundos de espera por comando del servidor. Los comandos de control deben
+# fallar rápido; el comisionamiento puede tardar más de un minuto.
+_DEFAULT_TIMEOUTS = {
+    "device_command": 3.0,
+    "get_nodes": 10.0,
+    "commission_with_code": 90.0,
+}
+_FALLBACK_TIMEOUT = 20.0
+
+# Máximo de dispositivos que el escritor guarda en una misma transacción
+_DB_WRITE_BATCH_SIZE = 64
+# Ventana en la que se acumulan cambios antes de cada commit (un fsync por tick)
+_DB_WRITE_INTERVAL = 0.05
+
+# Tipos de dispositivo conocidos, internados para compartir una sola instancia
+_TYPE_LIGHT = sys.intern("light")
+_TYPE_DIMMABLE_LIGHT = sys.intern("dimmable_light")
+_TYPE_UNKNOWN = sys.intern("unknown")
+
+# Rutas de atributos ("endpoint/cluster/atributo") que usamos
+_ATTR_ON_OFF = "1/6/0"  # On/Off, OnOff
+_ATTR_LEVEL = "1/8/0"  # Level Control, CurrentLevel
+_ATTR_PRODUCT_NAME = "0/40/14"  # Basic Information, ProductName
+
+# Atributos que se reflejan en Device.state
+_STATE_ATTRIBUTES = {
+    _ATTR_ON_OFF: "on",
+    _ATTR_LEVEL: "brightness",
+}
+
+
+def _level_to_percent(level: int) -> int:
+    """Convierte un nivel Matter (0-254) a porcentaje (0-100) con aritmética entera."""
+    return (level * 100 + 127) // 254
+
+
+# Prefijo JSON ya serializado de cada comando: '"command":"<nombre>"'
+_COMMAND_PREFIXES: Dict[str, bytes] = {}
+
+
+def _encode_command(message_id: int, command: str, args: Dict) -> bytes:
+    """
+    Serializa un mensaje de comando para el servidor.
+
+    Solo se serializan los argumentos en cada envío; el nombre del comando
+    se serializa una vez y se reutiliza.
+    """
+    prefix = _COMMAND_PREFIXES.get(command)
+    if prefix is None:
+        prefix = _COMMAND_PREFIXES[command] = _dumps({"command": command})[1:-1]
+    return b'{"message_id":"%d",%b,"args":%b}' % (message_id, prefix, _dumps(args))
 
 
 # La clase Device sigue siendo útil para estructurar los datos en nuestra aplicación
-@dataclass
+@dataclass(slots=True)
 class Device:
     """Representación de un dispositivo Matter en MatterCenter."""
 
@@ -46,60 +135,80 @@ class MatterController:
     - Gestionar el comisionamiento y eliminación de dispositivos a través del servidor.
     """
 
-    def __init__(self):
+    def __init__(self, database: Database):
+        # Base de datos donde se persisten los dispositivos
+        self.database = database
+
         # El caché local de dispositivos. El servidor es la fuente de verdad.
         self.devices: Dict[int, Device] = {}
+        # Respuestas JSON ya serializadas a partir de self.devices. Se
+        # invalidan al añadir, quitar o renombrar dispositivos y cuando cambia
+        # un campo que incluyen (el estado no forma parte de ellas).
+        self._json_cache: Dict[str, bytes] = {}
+        self._devices_tuple: Optional[Tuple[Device, ...]] = None
 
         # Configuración del servidor
-        server_host = os.getenv("MATTER_SERVER_HOST", "localhost")
-        server_port = os.getenv("MATTER_SERVER_PORT", "5580")
-        self.server_url = f"ws://{server_host}:{server_port}/ws"
+        self.server_url = _MATTER_SERVER_URL
 
-        self.connection: Optional[WebSocketClientProtocol] = None
-        self.is_initialized = False
-        self._message_id_counter = 1
-        # self.reconnect_task = None
-        # # CAMBIO CLAVE: "Buzones" para las respuestas a comandos
-        # self._pending_commands: Dict[str, asyncio.Future] = {}
+        # Evitar enviar comandos cuyo estado ya refleja el caché (desactivable para depurar)
+        self.coalesce_noops = os.getenv("MATTER_COALESCE_NOOPS", "True") == "True"
 
-    def _get_next_message_id(self) -> str:
+        self.connection: Optional[ClientConnection] = None
+        self.is_initialized = False
+        # IDs enteros; solo se convierten a texto al serializar el mensaje
+        self._message_id_counter = itertools.count(1)
+
+        # "Buzones" para las respuestas a comandos: message_id -> Future.
+        # Un único listener lee el WebSocket y resuelve cada Future.
+        self._pending_commands: Dict[int, asyncio.Future] = {}
+        self._listener_task: Optional[asyncio.Task] = None
+        self._resync_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        # Escrituras en la base de datos: se encolan los node_id modificados y
+        # un único escritor guarda el estado que tengan al escribir. Un nodo
+        # solo está una vez en la cola aunque cambie muchas veces, así que su
+        # tamaño nunca supera el número de dispositivos.
+        self._save_queue: asyncio.Queue = asyncio.Queue()
+        self._save_pending: Set[int] = set()
+        self._db_writer_task: Optional[asyncio.Task] = None
+        # websockets no admite envíos concurrentes de forma segura
+        self._send_lock = asyncio.Lock()
+
+    def _get_next_message_id(self) -> int:
         """Genera un ID de mensaje incremental."""
-        current_id = str(self._message_id_counter)
-        self._message_id_counter += 1
-        return current_id
+        return next(self._message_id_counter)
 
     async def initialize(self):
         """
         Inicializa el controlador estableciendo la conexión WebSocket
         y comenzando a escuchar eventos del servidor Matter.
+
+        Todo el tráfico pasa por el event loop; en Linux se ejecuta sobre
+        uvloop (ver `main.py` y la dependencia en requirements.txt).
         """
         if self.is_initialized:
             return
 
         logger.info(f"🔧 Conectando a python-matter-server en {self.server_url}...")
 
+        self._stopping = False
+        if self._db_writer_task is None:
+            self._db_writer_task = asyncio.create_task(self._db_writer())
+
         try:
             # 1. Conectar con un timeout generoso.
-            self.connection = await websockets.connect(self.server_url, open_timeout=15)
+            await self._connect()
             logger.success("🔌 Conexión WebSocket establecida.")
 
-            # # 2. Iniciar el listener de eventos. Es crucial que se inicie ANTES
-            # # de enviar cualquier comando para no perder respuestas.
-            # asyncio.create_task(self._listen_for_events())
-
-            await self._send_and_wait_for_response("set_wifi_credentials",
-                **{
-                    "ssid": "NOMBRE DEL WIFI",
-                    "credentials": "CONTRASEÑA1234"
-                })
+            # 2. Iniciar el listener de eventos. Es crucial que se inicie ANTES
+            # de enviar cualquier comando para no perder respuestas.
+            self._listener_task = asyncio.create_task(self._listen_for_events())
 
-            # 3. Suscribirse a los eventos y ESPERAR la confirmación.
-            logger.info("Subscribiendo a eventos del servidor...")
-            await self._send_and_wait_for_response("start_listening")
-            logger.success("✅ Subscripción a eventos confirmada.")
+            await self._send_request("set_wifi_credentials", _WIFI_CREDENTIALS)
 
-            # 4. Cargar los dispositivos iniciales.
-            await self._load_initial_devices()
+            # 3. Suscribirse a los eventos y cargar los dispositivos iniciales.
+            await self._sync_with_server()
 
             self.is_initialized = True
             logger.success("✅ Conectado y sincronizado con python-matter-server")
@@ -110,120 +219,458 @@ class MatterController:
             WebSocketException,
             asyncio.TimeoutError,
         ) as e:
-            logger.error("❌ Todos los intentos de conexión han fallado.")
+            logger.error(f"❌ No se pudo conectar con el Matter Server: {e}")
             logger.error("Asegúrate de que el servidor esté en ejecución y accesible.")
+            logger.info("🔄 Se seguirá reintentando en segundo plano.")
+            if self._listener_task is None:
+                # Sin conexión: reconectar con backoff y después escuchar
+                self._listener_task = asyncio.create_task(self._connect_and_listen())
+            else:
+                # Conectado pero sin sincronizar: el listener ya está leyendo
+                self._resync_task = asyncio.create_task(self._resync())
+
+    async def _connect_and_listen(self):
+        """Conecta con backoff (ver `_reconnect`) y pasa a leer eventos."""
+        await self._reconnect()
+        if not self._stopping:
+            await self._listen_for_events()
+
+    async def _connect(self):
+        """Abre la conexión WebSocket con el servidor Matter."""
+        # Sin compresión: los mensajes son JSON pequeños y frecuentes,
+        # y deflate solo añade CPU por trama en una red local (es lo que
+        # recomienda la documentación de websockets para este caso).
+        # max_size: la respuesta de get_nodes puede superar el 1 MiB por defecto
+        # en instalaciones grandes.
+        # max_queue: margen para ráfagas de eventos attribute_updated.
+        self.connection = await websockets.connect(
+            self.server_url,
+            open_timeout=15,
+            compression=None,
+            max_size=16 * 2**20,
+            max_queue=256,
+            ping_interval=20,
+            ping_timeout=20,
+        )
+
+    async def _sync_with_server(self):
+        """Se suscribe a los eventos del servidor y sincroniza los dispositivos."""
+        logger.info("Subscribiendo a eventos del servidor...")
+        await self._send_and_wait_for_response("start_listening")
+        logger.success("✅ Subscripción a eventos confirmada.")
+
+        await self._load_initial_devices()
+
+    async def _reconnect(self):
+        """Reintenta la conexión con backoff exponencial hasta conseguirlo."""
+        delay = 1
+        while not self._stopping:
+            logger.info(f"🔄 Reintentando conexión con Matter Server en {delay}s...")
+            await asyncio.sleep(delay)
+            try:
+                await self._connect()
+            except (OSError, WebSocketException, asyncio.TimeoutError) as e:
+                logger.warning(f"No se pudo reconectar: {e}")
+                delay = min(delay * 2, 30)
+                continue
+
+            logger.success("🔌 Conexión con Matter Server restablecida.")
+            # La resincronización necesita que el listener siga leyendo,
+            # así que se lanza en su propia tarea. La de una conexión
+            # anterior ya no sirve.
+            if self._resync_task is not None:
+                self._resync_task.cancel()
+            self._resync_task = asyncio.create_task(self._resync())
+            return
+
+    async def _resync(self):
+        """
+        Vuelve a suscribirse y recarga los dispositivos tras una reconexión.
+
+        Si falla reintenta con el mismo backoff que `_reconnect` hasta
+        conseguirlo o hasta que se pare el controlador.
+        """
+        delay = 1
+        while not self._stopping:
+            try:
+                await self._send_request("set_wifi_credentials", _WIFI_CREDENTIALS)
+                await self._sync_with_server()
+            except Exception as e:
+                logger.error(f"❌ Error resincronizando con Matter Server: {e}")
+                logger.info(f"🔄 Reintentando sincronización en {delay}s...")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+
+            if not self.is_initialized:
+                self.is_initialized = True
+                logger.success("✅ Conectado y sincronizado con python-matter-server")
+            return
 
     async def shutdown(self):
         """Cierra la conexión con el servidor Matter y guarda el estado."""
-        if self.connection and self.connection.state == State.OPEN:
+        self._stopping = True
+
+        for task in (self._listener_task, self._resync_task):
+            if task:
+                task.cancel()
+        self._listener_task = None
+        self._resync_task = None
+
+        if self.connection is not None:
             await self.connection.close()
             logger.info("🔌 Conexión con Matter Server cerrada.")
 
+        # Vaciar las escrituras pendientes antes de parar el escritor
+        if self._db_writer_task:
+            try:
+                await asyncio.wait_for(self._save_queue.join(), timeout=5)
+            except asyncio.TimeoutError:
+                logger.warning("⚠️ Quedaron escrituras pendientes sin guardar.")
+            self._db_writer_task.cancel()
+            self._db_writer_task = None
+
         self.is_initialized = False
 
-    async def _send_and_wait_for_response(self, command: str, **kwargs) -> Dict:
+    async def _send_and_wait_for_response(
+        self, command: str, *, timeout: Optional[float] = None, **kwargs
+    ) -> Dict:
+        """Atajo de `_send_request` para llamadas con argumentos por nombre."""
+        return await self._send_request(command, kwargs, timeout=timeout)
+
+    async def _send_request(
+        self, command: str, args: Dict, timeout: Optional[float] = None
+    ) -> Dict:
         """
-        Método único y robusto para la comunicación.
-        Envía un comando y entra en un bucle de escucha hasta encontrar la respuesta.
+        Envía un comando y espera su respuesta.
+
+        La respuesta la entrega `_listen_for_events` a través de un Future
+        registrado con el message_id, por lo que varios comandos pueden
+        estar en vuelo a la vez sin robarse las respuestas.
+
+        Args:
+            command: Comando del servidor
+            args: Argumentos del comando, se envían tal cual sin copiarlos
+            timeout: Segundos de espera; por defecto depende del comando
+
+        Raises:
+            ConnectionError: Si no hay conexión abierta con el servidor
+            TimeoutError: Si la respuesta no llega a tiempo
         """
-        if not self.connection or self.connection.state != State.OPEN:
-            raise ConnectionError("No hay conexión con el Matter Server.")
+        message_id = self._get_next_message_id()
+        payload = _encode_command(message_id, command, args)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending_commands[message_id] = future
 
+        try:
+            logger.debug("--> Enviando comando: {}", payload)
+            await self._write_frames(payload)
+
+            if timeout is None:
+                timeout = _DEFAULT_TIMEOUTS.get(command, _FALLBACK_TIMEOUT)
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"No se recibió respuesta para el comando '{command}' (id: {message_id}) en {timeout} segundos."
+            )
+        finally:
+            self._pending_commands.pop(message_id, None)
+
+    async def _send_requests(
+        self, command: str, args_list: List[Dict], timeout: Optional[float] = None
+    ) -> List:
+        """
+        Envía varios comandos seguidos y espera todas sus respuestas.
+
+        Las tramas se escriben en una sola toma del lock de envío, sin esperar
+        respuesta entre una y otra.
+
+        Returns:
+            Una respuesta o excepción por comando, en el mismo orden
+        """
+        if timeout is None:
+            timeout = _DEFAULT_TIMEOUTS.get(command, _FALLBACK_TIMEOUT)
+
+        loop = asyncio.get_running_loop()
+        message_ids = [self._get_next_message_id() for _ in args_list]
+        futures = []
+        for message_id in message_ids:
+            future = loop.create_future()
+            self._pending_commands[message_id] = future
+            futures.append(future)
+
+        try:
+            await self._write_frames(
+                *(
+                    _encode_command(message_id, command, args)
+                    for message_id, args in zip(message_ids, args_list)
+                )
+            )
+
+            responses = await asyncio.gather(
+                *(asyncio.wait_for(future, timeout=timeout) for future in futures),
+                return_exceptions=True,
+            )
+        finally:
+            for message_id in message_ids:
+                self._pending_commands.pop(message_id, None)
+
+        return [
+            TimeoutError(
+                f"No se recibió respuesta para el comando '{command}' (id: {message_id}) en {timeout} segundos."
+            )
+            if isinstance(response, asyncio.TimeoutError)
+            else response
+            for message_id, response in zip(message_ids, responses)
+        ]
+
+    async def _send_nowait(self, command: str, **kwargs):
+        """
+        Envía un comando sin esperar su respuesta.
+
+        Para comandos cuyo efecto llega después como evento del servidor.
+        Si el servidor responde con error, el listener lo registra en el log.
+        """
         message_id = self._get_next_message_id()
-        payload = {"message_id": message_id, "command": command, "args": kwargs}
+        payload = _encode_command(message_id, command, kwargs)
 
-        logger.debug(f"--> Enviando comando: {payload}")
-        await self.connection.send(json.dumps(payload))
+        logger.debug("--> Enviando comando sin respuesta: {}", payload)
+        await self._write_frames(payload)
 
-        start_time = time.time()
-        while time.time() - start_time < 120:  # Timeout de 120 segundos
-            try:
-                raw_response = await asyncio.wait_for(
-                    self.connection.recv(), timeout=1.0
+    async def _write_frames(self, *payloads: bytes):
+        """
+        Escribe una o varias tramas en el WebSocket bajo el lock de envío.
+
+        No se comprueba el estado de la conexión antes de enviar: si está
+        cerrada, websockets lanza ConnectionClosed y se traduce aquí.
+
+        Raises:
+            ConnectionError: Si no hay conexión con el servidor
+        """
+        if self.connection is None:
+            raise ConnectionError("No hay conexión con el Matter Server.")
+
+        try:
+            async with self._send_lock:
+                for payload in payloads:
+                    # Bytes ya codificados en UTF-8 enviados como trama de texto,
+                    # que es lo único que acepta python-matter-server
+                    await self.connection.send(payload, text=True)
+        except ConnectionClosed:
+            raise ConnectionError("No hay conexión con el Matter Server.") from None
+
+    async def _listen_for_events(self):
+        """
+        Único lector del WebSocket.
+
+        Entrega las respuestas a los comandos pendientes y enruta los
+        eventos del servidor para mantener `self.devices` actualizado.
+        Si la conexión se pierde, reconecta y sigue leyendo.
+        """
+        try:
+            while not self._stopping:
+                try:
+                    async for raw_message in self.connection:
+                        try:
+                            message = _loads(raw_message)
+                        except ValueError:
+                            logger.warning(f"Mensaje no válido recibido: {raw_message!r}")
+                            continue
+
+                        logger.debug("<-- Mensaje recibido: {}", message)
+                        try:
+                            self._dispatch_message(message)
+                        except Exception as e:
+                            # Un mensaje mal formado no puede tumbar al lector
+                            logger.opt(exception=e).error(
+                                f"❌ Error procesando mensaje: {raw_message!r}"
+                            )
+                except ConnectionClosed:
+                    pass
+
+                # Los comandos en vuelo no recibirán respuesta: fallan ya
+                # en lugar de esperar al timeout.
+                self._fail_pending_commands(
+                    ConnectionError("Conexión con el Matter Server perdida.")
                 )
-                response = json.loads(raw_response)
-                logger.debug(f"<-- Mensaje recibido: {response}")
-
-                if response.get("message_id") == message_id:
-                    if response.get("error_code"):
-                        error_details = response.get("details", str(response))
-                        raise RuntimeError(f"Error del servidor: {error_details}")
-                    return response
+                if self._stopping:
+                    break
+
+                logger.warning("🔌 Conexión con Matter Server cerrada por el servidor.")
+                await self._reconnect()
+        finally:
+            self._fail_pending_commands(
+                ConnectionError("Conexión con el Matter Server perdida.")
+            )
+
+    def _dispatch_message(self, message: Dict):
+        """Resuelve el Future de una respuesta o procesa un evento."""
+        if not isinstance(message, dict):
+            logger.warning(f"Mensaje inesperado recibido: {message!r}")
+            return
+
+        message_id = message.get("message_id")
+        if message_id is not None:
+            try:
+                future = self._pending_commands.pop(int(message_id), None)
+            except (TypeError, ValueError):
+                future = None
+            if future is None or future.done():
+                # Respuesta de un comando enviado sin esperar (_send_nowait)
+                if message.get("error_code"):
+                    error_details = message.get("details", str(message))
+                    logger.error(f"❌ Error del servidor (id: {message_id}): {error_details}")
                 else:
-                    # Ignorar eventos o respuestas para otros comandos
-                    logger.debug(
-                        "Mensaje recibido pero no es la respuesta esperada. Ignorando."
-                    )
-                    continue
+                    logger.debug(f"Respuesta sin comando pendiente (id: {message_id}).")
+            elif message.get("error_code"):
+                error_details = message.get("details", str(message))
+                future.set_exception(RuntimeError(f"Error del servidor: {error_details}"))
+            else:
+                future.set_result(message)
+            return
 
-            except asyncio.TimeoutError:
-                # No hubo mensajes en 1 segundo, el bucle de 20s continúa.
-                continue
+        event = message.get("event")
+        if event in ("node_added", "node_updated"):
+            self._update_device_from_server_data(message.get("data") or {})
+        elif event == "attribute_updated":
+            data = message.get("data")
+            if not isinstance(data, list) or len(data) != 3:
+                logger.warning(f"Evento attribute_updated mal formado: {data!r}")
+                return
+            node_id, attribute_path, value = data
+            self._apply_attribute_update(int(node_id), attribute_path, value)
+        elif event == "node_removed":
+            self._remove_device_from_cache(int(message["data"]))
+
+    def _apply_attribute_update(self, node_id: int, attribute_path: str, value):
+        """
+        Aplica el cambio de un único atributo sin reprocesar el nodo completo.
+        """
+        field_name = _STATE_ATTRIBUTES.get(attribute_path)
+        device = self.devices.get(node_id)
+        if field_name is None or device is None:
+            return
 
-        raise TimeoutError(
-            f"No se recibió respuesta para el comando '{command}' (id: {message_id}) en 20 segundos."
-        )
+        previous_type = device.device_type
+        if field_name == "brightness":
+            if value is None or device.state.get("brightness_raw") == value:
+                return
+            device.state["brightness"] = _level_to_percent(value)
+            device.state["brightness_raw"] = value
+            device.device_type = _TYPE_DIMMABLE_LIGHT
+        else:
+            if device.state.get("on") == value:
+                return
+            device.state["on"] = value
+            if device.device_type == _TYPE_UNKNOWN:
+                device.device_type = _TYPE_LIGHT
+
+        # Las vistas JSON cacheadas no incluyen el estado; solo el tipo
+        if device.device_type != previous_type:
+            self._invalidate_devices_cache()
+        # El escritor agrupa los cambios rápidos y guarda solo el último
+        self.save_device(device)
+
+    def _remove_device_from_cache(self, node_id: int):
+        """Quita un dispositivo del caché local si existe."""
+        if self.devices.pop(node_id, None) is not None:
+            self._invalidate_devices_cache()
+            # El escritor borra la fila de los nodos que ya no están en el caché
+            self._enqueue_save(node_id)
+            logger.info(f"🗑️ Dispositivo {node_id} eliminado del caché")
+
+    def _fail_pending_commands(self, error: Exception):
+        """Despierta a todos los comandos en espera con un error."""
+        for future in self._pending_commands.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending_commands.clear()
 
     def _update_device_from_server_data(self, data: Dict):
         node_id = data.get("node_id")
-        if not node_id:
+        if node_id is None:
             logger.error("Error: Nodo recibido sin node_id. Saltando.")
             return
+        node_id = int(node_id)
 
         attributes = data.get("attributes", {})
+        on_off_state = attributes.get(_ATTR_ON_OFF)
+        brightness_state = attributes.get(_ATTR_LEVEL)
+        # (Cluster 40, Atributo 14 = Nombre del Producto)
+        name = attributes.get(_ATTR_PRODUCT_NAME) or f"Dispositivo {node_id}"
+        is_online = data.get("available", False)
+
+        device = self.devices.get(node_id)
+        if (
+            device is not None
+            and device.is_online == is_online
+            and device.state.get("on") == on_off_state
+            and device.state.get("brightness_raw") == brightness_state
+            and device.name == name
+        ):
+            # Sin cambios: no reconstruimos el estado ni invalidamos el caché
+            return
+
+        # --- 1. Estado: On/Off (Cluster 6) y Brillo (Cluster 8) ---
         state = {}
-        
-        # Buscamos el estado On/Off (Cluster 6, Atributo 0)
-        on_off_state = attributes.get('1/6/0')
         if on_off_state is not None:
             state["on"] = on_off_state
-            
-        # Buscamos el estado de Brillo (Cluster 8, Atributo 0)
-        brightness_state = attributes.get('1/8/0')
         if brightness_state is not None:
-            # Convertimos el valor Matter (0-254) a porcentaje (0-100)
-            state["brightness"] = round(brightness_state / 2.54)
-            
+            state["brightness"] = _level_to_percent(brightness_state)
+            # Guardamos también el valor crudo para comparar sin errores de redondeo
+            state["brightness_raw"] = brightness_state
         # (Se podrían añadir estados de color del Cluster 768 aquí)
 
         # --- 2. Determinar el Tipo de Dispositivo ---
-        device_type = "unknown"
-        if "brightness" in state:
-            device_type = "dimmable_light"
-        elif "on" in state:
-            device_type = "light"
-        
-        # --- 3. Obtener el Nombre ---
-        # (Cluster 40, Atributo 14 = Nombre del Producto)
-        name = attributes.get('0/40/14', f"Dispositivo {node_id}")
-        
-        # --- 4. Actualizar o Crear el Dispositivo ---
-        if node_id in self.devices:
-            device = self.devices[node_id]
-            device.is_online = data.get("available", False)
+        device_type = (
+            _TYPE_DIMMABLE_LIGHT
+            if brightness_state is not None
+            else _TYPE_LIGHT if on_off_state is not None else _TYPE_UNKNOWN
+        )
+
+        # --- 3. Actualizar o Crear el Dispositivo ---
+        if device is not None:
+            device.is_online = is_online
             device.state = state
             device.name = name # Actualizamos el nombre por si cambia
             device.device_type = device_type
+            self._invalidate_devices_cache()
         else:
             device = Device(
                 node_id=node_id,
                 name=name,
                 device_type=device_type,
-                is_online=data.get("available", False),
+                is_online=is_online,
                 state=state,
                 endpoint_id=1 # Asumimos endpoint 1
             )
             self.devices[node_id] = device
+            self._invalidate_devices_cache()
             logger.info(
                 f"✨ Dispositivo nuevo detectado y procesado: {device.name} (Node {node_id})"
             )
 
+        self.save_device(device)
+
     async def _load_initial_devices(self):
         """Pide al servidor la lista completa de nodos al iniciar."""
         logger.info("📦 Solicitando lista de dispositivos al servidor...")
         response = await self._send_and_wait_for_response("get_nodes")
+        server_node_ids = set()
         for data in response["result"]:
             self._update_device_from_server_data(data)
+            if data.get("node_id") is not None:
+                server_node_ids.add(int(data["node_id"]))
+
+        # Quitar los dispositivos que ya no existen en el servidor
+        stale_node_ids = self.devices.keys() - server_node_ids
+        for node_id in stale_node_ids:
+            del self.devices[node_id]
+            self._enqueue_save(node_id)
+        if stale_node_ids:
+            self._invalidate_devices_cache()
+
         logger.success(
             f"✅ {len(self.devices)} dispositivos cargados desde el servidor."
         )
@@ -237,41 +684,97 @@ class MatterController:
             code=setup_code,
             use_network_manager=True  # <--- ¡AÑADE ESTA LÍNEA!
         )
-        # Después de comisionar, volvemos a cargar la lista para obtener el nuevo dispositivo
-        await self._load_initial_devices()
+        # El servidor devuelve el nodo recién comisionado: lo añadimos directamente
+        # en lugar de volver a pedir la lista completa
+        result = response.get("result") or {}
+        self._update_device_from_server_data(result)
         logger.success(f"Dispositivo comisionado con éxito: {response.get('result')}")
-        return response.get("result", {})
+        return result
 
-    def list_devices(self) -> List[Device]:
-        """Devuelve la lista de dispositivos desde el caché local."""
-        return list(self.devices.values())
+    def list_devices(self) -> Tuple[Device, ...]:
+        """
+        Devuelve los dispositivos desde el caché local.
 
+        La tupla se reutiliza hasta que se añade o elimina un dispositivo.
+        """
+        if self._devices_tuple is None:
+            self._devices_tuple = tuple(self.devices.values())
+        return self._devices_tuple
 
-    # TODO: Averiguar como funciona el cluster de python matter server
-    # y mapear los comandos de la API a comandos del servidor para
-    # arreglar esta funcion
-    async def send_command(self, node_id: int, command: str, **params):
+    def _invalidate_devices_cache(self):
+        """Descarta las vistas cacheadas tras un cambio en self.devices."""
+        self._json_cache.clear()
+        self._devices_tuple = None
+
+    def list_devices_json(self) -> bytes:
         """
-        Envía un comando a un dispositivo, traduciéndolo al formato del servidor.
+        Devuelve la lista de dispositivos ya serializada en JSON.
+
+        Se construye una sola vez y se reutiliza hasta que cambie algún dispositivo.
         """
+        cached = self._json_cache.get("devices")
+        if cached is None:
+            cached = _dumps(
+                [
+                    {
+                        "node_id": device.node_id,
+                        "name": device.name,
+                        "type": device.device_type,
+                        "online": device.is_online,
+                        "endpoint": device.endpoint_id,
+                    }
+                    for device in self.devices.values()
+                ]
+            )
+            self._json_cache["devices"] = cached
+        return cached
+
+    def health_json(self) -> bytes:
+        """Devuelve el estado de salud del sistema ya serializado en JSON."""
+        cached = self._json_cache.get("health")
+        if cached is None:
+            cached = _dumps(
+                {
+                    "status": "healthy",
+                    "devices_count": len(self.devices),
+                    "devices": [
+                        {
+                            "node_id": device.node_id,
+                            "name": device.name,
+                            "online": device.is_online,
+                        }
+                        for device in self.devices.values()
+                    ],
+                }
+            )
+            self._json_cache["health"] = cached
+        return cached
+
+    def rename_device(self, node_id: int, name: str) -> Device:
+        """Cambia el nombre de un dispositivo en el caché local."""
         if node_id not in self.devices:
             raise ValueError(f"Dispositivo {node_id} no encontrado")
 
         device = self.devices[node_id]
-        logger.info(f"📤 Comando '{command}' → {device.name} (Node {node_id})")
+        device.name = name
+        self._invalidate_devices_cache()
+        return device
+
 
-        # Traducción de comandos de la API a comandos del servidor
-        server_command = ""
-        command_params = {}
-
-        if command == "on":
-            server_command = "on_off.on"
-        elif command == "off":
-            server_command = "on_off.off"
-        elif command == "toggle":
-            server_command = "on_off.toggle"
-        elif command == "level":
+    def _translate_command(self, command: str, params: Dict) -> Tuple[str, Dict]:
+        """
+        Traduce un comando de la API al par (comando, parámetros) del servidor.
+        """
+        server_command = _STATIC_COMMANDS.get(command)
+        if server_command is not None:
+            return server_command, _NO_PARAMS
+
+        if command == "level":
             brightness_percent = params.get("level", 100)
+            if isinstance(brightness_percent, bool) or not isinstance(
+                brightness_percent, (int, float)
+            ):
+                raise ValueError("El brillo debe ser un número")
             if not 0 <= brightness_percent <= 100:
                 raise ValueError("El brillo debe estar entre 0 y 100")
             # Convertir porcentaje a valor Matter (0-254)
@@ -281,17 +784,116 @@ class MatterController:
         else:
             raise ValueError(f"Comando no reconocido: {command}")
 
+        return server_command, command_params
+
+    def _is_noop(self, device: Device, command: str, command_params: Dict) -> bool:
+        """Indica si el estado en caché ya refleja el resultado del comando."""
+        if not self.coalesce_noops:
+            return False
+        if command in ("on", "off"):
+            return device.state.get("on") is (command == "on")
+        if command == "level":
+            return device.state.get("brightness_raw") == command_params["level"]
+        return False
+
+    def _prepare_device_command(
+        self, node_id: int, command: str, params: Dict
+    ) -> Optional[Dict]:
+        """
+        Valida y traduce un comando para un dispositivo.
+
+        Returns:
+            Argumentos de `device_command`, o None si el comando no cambiaría nada
+        """
+        if node_id not in self.devices:
+            raise ValueError(f"Dispositivo {node_id} no encontrado")
+
+        device = self.devices[node_id]
+        logger.info(f"📤 Comando '{command}' → {device.name} (Node {node_id})")
+
+        server_command, command_params = self._translate_command(command, params)
+
+        # Si el caché ya refleja el estado pedido, no molestamos a la red Thread
+        if self._is_noop(device, command, command_params):
+            logger.debug(f"Node {node_id} ya está en el estado de '{command}'. Comando omitido.")
+            return None
+
+        return {
+            "node_id": node_id,
+            "endpoint_id": device.endpoint_id,
+            "name": server_command,
+            "params": command_params,
+        }
+
+    # TODO: Averiguar como funciona el cluster de python matter server
+    # y mapear los comandos de la API a comandos del servidor para
+    # arreglar esta funcion
+    async def send_command(self, node_id: int, command: str, **params):
+        """
+        Envía un comando a un dispositivo, traduciéndolo al formato del servidor.
+        """
+        args = self._prepare_device_command(node_id, command, params)
+        if args is None:
+            return {"noop": True}
+
         # Enviar comando al servidor
-        result = await self._send_and_wait_for_response(
-            "device_command",
-            node_id=node_id,
-            endpoint_id=device.endpoint_id,
-            name=server_command,
-            params=command_params,
-        )
-        logger.debug(f"Respuesta del servidor al comando: {result}")
+        result = await self._send_request("device_command", args)
+        logger.debug("Respuesta del servidor al comando: {}", result)
         return result.get("result", {})
 
+    async def send_commands_batch(
+        self, commands: List[Tuple[int, str, Dict]]
+    ) -> List[Dict]:
+        """
+        Envía varios comandos a la vez y recoge el resultado de cada uno.
+
+        Todas las tramas se escriben seguidas y después se esperan todas las
+        respuestas, así que el tiempo total es el de un solo viaje de ida y
+        vuelta y no la suma de todos. Un fallo no afecta al resto.
+
+        Args:
+            commands: Lista de tuplas (node_id, comando, parámetros)
+
+        Returns:
+            Lista de {node_id, success, result | error} en el mismo orden
+        """
+        results: List = [None] * len(commands)
+        to_send: List[Tuple[int, Dict]] = []
+
+        for index, (node_id, command, params) in enumerate(commands):
+            try:
+                args = self._prepare_device_command(node_id, command, params)
+            except ValueError as e:
+                results[index] = e
+                continue
+            if args is None:
+                results[index] = {"noop": True}
+            else:
+                to_send.append((index, args))
+
+        if to_send:
+            responses = await self._send_requests(
+                "device_command", [args for _, args in to_send]
+            )
+            for (index, _), response in zip(to_send, responses):
+                results[index] = (
+                    response
+                    if isinstance(response, Exception)
+                    else response.get("result", {})
+                )
+
+        batch_results = []
+        for (node_id, _, _), result in zip(commands, results):
+            if isinstance(result, Exception):
+                batch_results.append(
+                    {"node_id": node_id, "success": False, "error": str(result)}
+                )
+            else:
+                batch_results.append(
+                    {"node_id": node_id, "success": True, "result": result}
+                )
+        return batch_results
+
     async def remove_device(self, node_id: int):
         if node_id not in self.devices:
             raise ValueError(f"Dispositivo {node_id} no encontrado")
@@ -299,23 +901,72 @@ class MatterController:
         logger.warning(
             f"🗑️ Solicitando eliminación del dispositivo {node_id} al servidor..."
         )
-        await self._send_and_wait_for_response("remove_node", node_id=node_id)
-        # Refrescar la lista de dispositivos después de eliminar
-        await self._load_initial_devices()
+        # No esperamos la respuesta: el evento node_removed del servidor
+        # quitará el dispositivo del caché.
+        await self._send_nowait("remove_node", node_id=node_id)
         
-    async def save_device(self, device: Device):
-        logger.debug(f"💾 Guardando dispositivo {device.node_id} en la base de datos...")
-        try:
-            db = get_database()
-            db.save_device(
-                node_id=device.node_id,
-                name=device.name,
-                device_type=device.device_type,
-                endpoint_id=device.endpoint_id,
-                is_online=device.is_online,
-                state=device.state
-            )
-            logger.debug(f"💾 Dispositivo {device.node_id} guardado con éxito.")
-        except Exception as e:
-            # Es importante que esto no crashee la app principal
-            logger.error(f"❌ Error al guardar en la base de datos: {e}")
\ No newline at end of file
+    async def _db_writer(self):
+        """
+        Único escritor de la base de datos.
+
+        Espera `_DB_WRITE_INTERVAL` para acumular cambios, guarda en una sola
+        transacción el estado que tienen en ese momento los dispositivos
+        encolados y borra las filas de los que ya no están en el caché. Al ser el único camino hacia la base de datos, las escrituras de un
+        mismo nodo nunca se adelantan entre sí.
+        """
+        while True:
+            batch = [await self._save_queue.get()]
+            await asyncio.sleep(_DB_WRITE_INTERVAL)
+            while len(batch) < _DB_WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._save_queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            # Un cambio posterior a la foto vuelve a encolar el nodo
+            self._save_pending.difference_update(batch)
+            rows = []
+            removed_node_ids = []
+            for node_id in batch:
+                device = self.devices.get(node_id)
+                if device is None:
+                    # Ya no está en el caché: se eliminó del servidor
+                    removed_node_ids.append(node_id)
+                    continue
+                rows.append(
+                    {
+                        "node_id": device.node_id,
+                        "name": device.name,
+                        "device_type": device.device_type,
+                        "endpoint_id": device.endpoint_id,
+                        "is_online": device.is_online,
+                        "state": dict(device.state),
+                    }
+                )
+            try:
+                await self.database.asave_devices(rows)
+                await self.database.adelete_devices(removed_node_ids)
+                logger.debug(
+                    f"💾 {len(rows)} dispositivos guardados y "
+                    f"{len(removed_node_ids)} eliminados con éxito."
+                )
+            except Exception as e:
+                # Es importante que esto no crashee la app principal. Los
+                # nodos se reintentan en el siguiente tick.
+                logger.error(f"❌ Error al guardar en la base de datos: {e}")
+                for node_id in batch:
+                    self._enqueue_save(node_id)
+            finally:
+                for _ in batch:
+                    self._save_queue.task_done()
+
+    def save_device(self, device: Device):
+        """Encola un dispositivo para guardarlo en segundo plano."""
+        self._enqueue_save(device.node_id)
+
+    def _enqueue_save(self, node_id: int):
+        """Encola un node_id para el escritor si no está ya pendiente."""
+        if node_id in self._save_pending:
+            return
+        self._save_pending.add(node_id)
+        self._save_queue.put_nowait(node_id)
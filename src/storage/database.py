@@ -2,18 +2,92 @@
 Database - Persistencia de dispositivos con SQLite
 """
 
-import json
-from datetime import datetime
+import asyncio
+import threading
+import warnings
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import cached_property
 from pathlib import Path
-from typing import Optional, List
-
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Text
+from typing import Dict, Iterable, Iterator, Optional, List, Set
+
+from sqlalchemy import (
+    create_engine,
+    event,
+    bindparam,
+    cast,
+    delete,
+    func,
+    select,
+    text,
+    update,
+    type_coerce,
+    Column,
+    Index,
+    BigInteger,
+    Integer,
+    String,
+    Boolean,
+    JSON,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import QueuePool, StaticPool
 from loguru import logger
 
 Base = declarative_base()
 
+# Serialización de las columnas JSON: orjson si está disponible
+try:
+    import orjson
+
+    def _json_serializer(value) -> str:
+        return orjson.dumps(value).decode()
+
+    _json_deserializer = orjson.loads
+except ImportError:
+    import json
+
+    _json_serializer = json.dumps
+    _json_deserializer = json.loads
+
+# PRAGMAs aplicados a cada conexión nueva (solo en bases de datos en fichero).
+# WAL + synchronous=NORMAL: los lectores no bloquean al escritor y cada commit
+# hace un único fsync (en el checkpoint) en lugar de dos.
+# auto_vacuum va antes de crear tablas; journal_size_limit trunca el -wal tras
+# cada checkpoint para que no crezca sin límite.
+_SQLITE_PRAGMAS = (
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA journal_size_limit=67108864",  # 64 MB
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",  # ~20 MB de caché de páginas
+    "PRAGMA mmap_size=268435456",  # 256 MB
+    "PRAGMA wal_autocheckpoint=1000",
+    "PRAGMA foreign_keys=ON",
+)
+
+# Sentencias preparadas que sqlite3 guarda por conexión (por defecto 128)
+_SQLITE_CACHED_STATEMENTS = 256
+
+
+# Instante actual en milisegundos desde epoch, calculado por SQLite
+_EPOCH_MS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+_EPOCH_MS_NOW = cast((func.julianday("now") - 2440587.5) * 86400000, BigInteger)
+
+
+def epoch_ms_to_datetime(epoch_ms: Optional[int]) -> Optional[datetime]:
+    """Convertir milisegundos desde epoch a datetime UTC."""
+    if epoch_ms is None:
+        return None
+    return datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc)
+
 
 class DeviceDB(Base):
     """
@@ -22,20 +96,137 @@ class DeviceDB(Base):
     """
 
     __tablename__ = "devices"
+    __table_args__ = (
+        # "Todas las luces online" y consultas por recencia sin recorrer la tabla
+        Index("ix_device_type_online", "device_type", "is_online"),
+        Index("ix_updated_at", "updated_at"),
+    )
 
     node_id = Column(Integer, primary_key=True, autoincrement=False)
     name = Column(String(100), nullable=False)
     device_type = Column(String(50), nullable=False)  # "light", "switch", etc
     endpoint_id = Column(Integer, default=1)
     is_online = Column(Boolean, default=True)
-    state = Column(Text, nullable=True)  # JSON string del estado
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    state = Column(JSON, nullable=True)  # Estado como JSON nativo de SQLite
+    # Marcas de tiempo en milisegundos desde epoch (INTEGER de 8 bytes),
+    # generadas por SQLite dentro de la propia sentencia. default/onupdate las
+    # añaden al INSERT/UPDATE también en tablas creadas sin server_default.
+    created_at = Column(
+        BigInteger,
+        default=_EPOCH_MS_NOW,
+        server_default=text(f"({_EPOCH_MS_SQL})"),
+    )
+    updated_at = Column(
+        BigInteger,
+        default=_EPOCH_MS_NOW,
+        server_default=text(f"({_EPOCH_MS_SQL})"),
+        onupdate=_EPOCH_MS_NOW,
+    )
+
+    @property
+    def created_datetime(self) -> Optional[datetime]:
+        return epoch_ms_to_datetime(self.created_at)
+
+    @property
+    def updated_datetime(self) -> Optional[datetime]:
+        return epoch_ms_to_datetime(self.updated_at)
 
     def __repr__(self):
         return f"<DeviceDB(node_id={self.node_id}, name='{self.name}')>"
 
 
+# Índice sobre el estado encendido/apagado para filtrar sin recorrer la tabla
+Index("ix_device_on", func.json_extract(DeviceDB.state, "$.on"))
+
+
+def _build_device_upsert():
+    """INSERT ... ON CONFLICT(node_id) DO UPDATE para la tabla de dispositivos."""
+    stmt = sqlite_insert(DeviceDB.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=[DeviceDB.node_id],
+        set_={
+            column: stmt.excluded[column]
+            for column in (
+                "name",
+                "device_type",
+                "endpoint_id",
+                "is_online",
+                "state",
+                "updated_at",
+            )
+        },
+    )
+
+
+# Sentencias Core construidas una sola vez y reutilizadas en cada llamada.
+# Las operaciones frecuentes no pasan por la Session ni el identity map del ORM.
+_UPSERT_DEVICE = _build_device_upsert()
+_SELECT_DEVICE = select(DeviceDB.__table__).where(
+    DeviceDB.node_id == bindparam("node_id")
+)
+# El SET lo generan los parámetros de execute (state) y el onupdate de
+# updated_at; el WHERE usa otro nombre porque SQLAlchemy reserva los nombres
+# de columna en un UPDATE
+_UPDATE_DEVICE_STATE = update(DeviceDB.__table__).where(
+    DeviceDB.node_id == bindparam("target_node_id")
+)
+_DELETE_DEVICE = delete(DeviceDB.__table__).where(
+    DeviceDB.node_id == bindparam("node_id")
+)
+# Listado completo en streaming; el estado sale como texto sin deserializar
+_SELECT_ALL_DEVICES = select(
+    DeviceDB.node_id,
+    DeviceDB.name,
+    DeviceDB.device_type,
+    DeviceDB.endpoint_id,
+    DeviceDB.is_online,
+    type_coerce(DeviceDB.state, String).label("state_json"),
+    DeviceDB.created_at,
+    DeviceDB.updated_at,
+).execution_options(yield_per=256)
+
+
+@dataclass
+class DeviceRecord:
+    """
+    Fila de la tabla de dispositivos, de solo lectura y sin identity map.
+    El estado JSON solo se deserializa si alguien lo lee.
+    """
+
+    node_id: int
+    name: str
+    device_type: str
+    endpoint_id: int
+    is_online: bool
+    state_json: Optional[str]
+    created_at: Optional[int]  # ms desde epoch
+    updated_at: Optional[int]  # ms desde epoch
+
+    @cached_property
+    def state(self) -> dict:
+        return _json_deserializer(self.state_json) if self.state_json else {}
+
+    @property
+    def created_datetime(self) -> Optional[datetime]:
+        return epoch_ms_to_datetime(self.created_at)
+
+    @property
+    def updated_datetime(self) -> Optional[datetime]:
+        return epoch_ms_to_datetime(self.updated_at)
+
+
+class _RowCache:
+    """
+    Caché de filas de get_device por node_id.
+    `generation` evita que una lectura lanzada antes de un commit guarde la fila antigua.
+    """
+
+    def __init__(self):
+        self.rows: Dict[int, dict] = {}
+        self.generation = 0
+        self.lock = threading.RLock()
+
+
 class Database:
     """
     Gestor de base de datos SQLite.
@@ -54,26 +245,246 @@ class Database:
 
         # Crear engine
         self.db_path = db_path
+        if db_path == ":memory:":
+            # Una sola conexión compartida: cada conexión nueva sería otra base vacía
+            pool_options = {"poolclass": StaticPool}
+        else:
+            # Conexiones de larga vida: abrir una conexión SQLite cuesta y
+            # descarta su caché de páginas
+            pool_options = {
+                "poolclass": QueuePool,
+                "pool_size": 5,
+                "max_overflow": 10,
+                "pool_pre_ping": False,
+                "pool_recycle": -1,
+            }
+
+        # Las sentencias son constantes de módulo: SQLAlchemy reutiliza su
+        # forma compilada desde su caché (query_cache_size) y sqlite3 el
+        # programa VDBE ya preparado desde la de cada conexión (cached_statements)
         self.engine = create_engine(
             f"sqlite:///{db_path}",
             echo=False,  # True para ver queries SQL en logs
-            connect_args={"check_same_thread": False},  # Para uso async
+            connect_args={
+                "check_same_thread": False,  # Para uso async
+                "cached_statements": _SQLITE_CACHED_STATEMENTS,
+            },
+            json_serializer=_json_serializer,
+            json_deserializer=_json_deserializer,
+            **pool_options,
         )
 
+        # Engine asíncrono (aiosqlite) para usar desde el event loop sin
+        # bloquearlo. Una base :memory: no se puede compartir entre engines,
+        # así que en ese caso los métodos async delegan en un hilo.
+        self.async_engine: Optional[AsyncEngine] = None
+        if db_path != ":memory:":
+            self.async_engine = create_async_engine(
+                f"sqlite+aiosqlite:///{db_path}",
+                echo=False,
+                connect_args={"cached_statements": _SQLITE_CACHED_STATEMENTS},
+                json_serializer=_json_serializer,
+                json_deserializer=_json_deserializer,
+                pool_size=5,
+                max_overflow=10,
+                pool_recycle=-1,
+            )
+
+        # El BEGIN lo emite SQLAlchemy (listener "begin") y no pysqlite, que
+        # abre transacciones diferidas por su cuenta. Las escrituras usan los
+        # engines *_write y toman el lock de escritura con BEGIN IMMEDIATE
+        # desde el principio: sin promoción a mitad de transacción no hay
+        # SQLITE_BUSY entre escritores concurrentes.
+        sync_engines = [self.engine]
+        if self.async_engine is not None:
+            sync_engines.append(self.async_engine.sync_engine)
+        for sync_engine in sync_engines:
+            event.listen(sync_engine, "connect", self._disable_driver_transactions)
+            event.listen(sync_engine, "begin", self._begin_transaction)
+            if db_path != ":memory:":
+                event.listen(sync_engine, "connect", self._apply_pragmas)
+
+        self.write_engine = self.engine.execution_options(sqlite_immediate=True)
+        self.async_write_engine: Optional[AsyncEngine] = None
+        if self.async_engine is not None:
+            self.async_write_engine = self.async_engine.execution_options(
+                sqlite_immediate=True
+            )
+
         # Crear SessionMaker
         self.SessionLocal = sessionmaker(
             autocommit=False, autoflush=False, bind=self.engine
         )
 
+        self._prepare_schema()
+
+        # Caché de filas de get_device; se invalida después de cada commit
+        # que toca el dispositivo
+        self._row_cache = _RowCache()
+        # node_ids escritos en cada transacción abierta con transaction()
+        self._txn_written: Dict[Connection, Set[int]] = {}
+
+        logger.info(f"💾 Base de datos inicializada: {db_path}")
+
+    def _prepare_schema(self):
+        """Crear tablas e índices, migrar datos antiguos y recalcular estadísticas."""
         # Crear tablas si no existen
         Base.metadata.create_all(self.engine)
+        # create_all no añade índices nuevos a tablas que ya existen. IF NOT
+        # EXISTS en lugar de checkfirst: SQLite no refleja los índices sobre
+        # expresiones (ix_device_on) y checkfirst intentaría crearlos otra vez
+        with self.engine.begin() as connection:
+            for index in DeviceDB.__table__.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+        # Las bases antiguas guardaban las marcas de tiempo como texto DATETIME
+        with self.write_engine.begin() as connection:
+            for column in ("created_at", "updated_at"):
+                connection.exec_driver_sql(
+                    f"UPDATE devices SET {column} = CAST("
+                    f"(julianday({column}) - 2440587.5) * 86400000 AS INTEGER) "
+                    f"WHERE typeof({column}) = 'text'"
+                )
 
-        logger.info(f"💾 Base de datos inicializada: {db_path}")
+        # auto_vacuum solo cambia en una base existente tras un VACUUM completo
+        if self.db_path != ":memory:":
+            [(auto_vacuum,)] = self._execute_outside_transaction("PRAGMA auto_vacuum")
+            if auto_vacuum != 2:  # 2 = INCREMENTAL
+                logger.info("🧹 Activando auto_vacuum incremental (VACUUM)")
+                self._execute_outside_transaction("VACUUM")
+
+        # Estadísticas para el planificador; se guardan en sqlite_stat1, así
+        # que basta con recalcularlas una vez por arranque
+        self._execute_outside_transaction("ANALYZE")
+
+    @staticmethod
+    def _disable_driver_transactions(dbapi_connection, connection_record):
+        """Desactivar el BEGIN implícito de pysqlite; lo emite `_begin_transaction`."""
+        dbapi_connection.isolation_level = None
+
+    @staticmethod
+    def _begin_transaction(connection):
+        """BEGIN IMMEDIATE en los engines de escritura, BEGIN diferido en lecturas."""
+        if connection.get_execution_options().get("sqlite_immediate"):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            connection.exec_driver_sql("BEGIN")
+
+    @staticmethod
+    def _apply_pragmas(dbapi_connection, connection_record):
+        """Configurar cada conexión SQLite nueva (WAL y ajustes de rendimiento)."""
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in _SQLITE_PRAGMAS:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    def checkpoint(self):
+        """
+        Volcar el WAL al fichero principal sin bloquear a lectores ni escritores.
+        """
+        self._execute_outside_transaction("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def vacuum(self, pages: int = 100):
+        """
+        Devolver al sistema hasta `pages` páginas libres (auto_vacuum incremental).
+
+        Args:
+            pages: Máximo de páginas a liberar en esta llamada
+        """
+        self._execute_outside_transaction(f"PRAGMA incremental_vacuum({int(pages)})")
+
+    def _execute_outside_transaction(self, sql: str) -> list:
+        """
+        Ejecutar una sentencia en la conexión DBAPI, sin el BEGIN que emite
+        `_begin_transaction` (ANALYZE y los checkpoints deben ir fuera de él).
+
+        Returns:
+            Filas devueltas; leerlas todas hace que sqlite3 ejecute la sentencia
+            completa (incremental_vacuum libera una página por paso)
+        """
+        dbapi_connection = self.engine.raw_connection()
+        try:
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute(sql)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+        finally:
+            dbapi_connection.close()
 
     def get_session(self) -> Session:
         """Crear una nueva sesión de base de datos"""
         return self.SessionLocal()
 
+    @contextmanager
+    def transaction(self, write: bool = False) -> Iterator[Connection]:
+        """
+        Abrir una transacción corta: commit al salir, rollback si hay excepción.
+
+        Las operaciones CRUD aceptan la conexión devuelta (`connection=`) para
+        agrupar varias escrituras en un solo commit del WAL:
+
+            with db.transaction(write=True) as connection:
+                db.update_device_state(1, state_1, connection=connection)
+                db.update_device_state(2, state_2, connection=connection)
+
+        Args:
+            write: True para tomar el lock de escritura desde el inicio
+                (BEGIN IMMEDIATE)
+        """
+        engine = self.write_engine if write else self.engine
+        written: Set[int] = set()
+        with engine.begin() as connection:
+            self._txn_written[connection] = written
+            try:
+                yield connection
+            finally:
+                del self._txn_written[connection]
+        self._forget_rows(written)
+
+    @contextmanager
+    def _join(
+        self, connection: Optional[Connection], write: bool
+    ) -> Iterator[Connection]:
+        """Usar la transacción del llamador o abrir una propia."""
+        if connection is not None:
+            yield connection
+        else:
+            with self.transaction(write=write) as own_connection:
+                yield own_connection
+
+    # ========== Caché de filas ==========
+
+    def _mark_written(self, connection: Connection, node_ids: Iterable[int]):
+        """Invalidar la caché de estos nodos cuando la transacción haga commit."""
+        written = self._txn_written.get(connection)
+        if written is not None:
+            written.update(node_ids)
+        else:
+            # Conexión ajena a transaction(): sin commit que esperar
+            self._forget_rows(node_ids)
+
+    def _forget_rows(self, node_ids: Iterable[int]):
+        """Sacar de la caché las filas de estos nodos."""
+        with self._row_cache.lock:
+            self._row_cache.generation += 1
+            for node_id in node_ids:
+                self._row_cache.rows.pop(node_id, None)
+
+    def _cached_row(self, node_id: int) -> Optional[dict]:
+        """Copia de la fila cacheada o None si no está en caché."""
+        with self._row_cache.lock:
+            row = self._row_cache.rows.get(node_id)
+        return dict(row) if row is not None else None
+
+    def _cache_row(self, node_id: int, row: dict, generation: int):
+        """Guardar una fila leída si no hubo escrituras desde que se leyó."""
+        with self._row_cache.lock:
+            if generation == self._row_cache.generation:
+                self._row_cache.rows[node_id] = row
+
     # ========== CRUD Operations ==========
 
     def save_device(
@@ -84,10 +495,14 @@ class Database:
         endpoint_id: int,
         is_online: bool,
         state: dict,
-    ) -> DeviceDB:
+        connection: Optional[Connection] = None,
+    ):
         """
         Guardar o actualizar un dispositivo.
 
+        Un único INSERT ... ON CONFLICT DO UPDATE sobre una conexión Core,
+        sin consulta previa ni refresco del objeto ORM.
+
         Args:
             node_id: ID del nodo
             name: Nombre del dispositivo
@@ -95,51 +510,64 @@ class Database:
             endpoint_id: ID del endpoint
             is_online: Estado online
             state: Estado actual del dispositivo (dict)
-
-        Returns:
-            DeviceDB: Dispositivo guardado
+            connection: Transacción abierta con `transaction()` (opcional)
         """
-        session = self.get_session()
-
         try:
-            # Buscar si ya existe
-            device = session.query(DeviceDB).filter_by(node_id=node_id).first()
-
-            if device:
-                # Actualizar existente
-                device.name = name
-                device.device_type = device_type
-                device.endpoint_id = endpoint_id
-                device.is_online = is_online
-                device.state = json.dumps(state)
-                device.updated_at = datetime.utcnow()
-                logger.debug(f"Actualizando dispositivo {node_id}")
-            else:
-                # Crear nuevo
-                device = DeviceDB(
-                    node_id=node_id,
-                    name=name,
-                    device_type=device_type,
-                    endpoint_id=endpoint_id,
-                    is_online=is_online,
-                    state=json.dumps(state),
+            with self._join(connection, write=True) as txn:
+                txn.execute(
+                    _UPSERT_DEVICE,
+                    {
+                        "node_id": node_id,
+                        "name": name,
+                        "device_type": device_type,
+                        "endpoint_id": endpoint_id,
+                        "is_online": is_online,
+                        "state": state,
+                    },
                 )
-                session.add(device)
-                logger.debug(f"Creando dispositivo {node_id}")
+                self._mark_written(txn, (node_id,))
+            logger.debug(f"Dispositivo {node_id} guardado")
+
+        except Exception as e:
+            logger.error(f"Error guardando dispositivo: {e}")
+            raise
 
-            session.commit()
-            session.refresh(device)
+    def save_devices(
+        self,
+        devices: List[dict],
+        batch_size: int = 500,
+        connection: Optional[Connection] = None,
+    ):
+        """
+        Guardar o actualizar varios dispositivos en una sola transacción.
+
+        El mismo upsert que `save_device`, ejecutado con executemany: un solo
+        commit (y un solo fsync del WAL) para todos los dispositivos.
+
+        Args:
+            devices: Diccionarios con node_id, name, device_type, endpoint_id,
+                is_online y state (dict)
+            batch_size: Filas por executemany; ~500 mantiene cada llamada
+                lejos de SQLITE_MAX_VARIABLE_NUMBER
+            connection: Transacción abierta con `transaction()` (opcional)
+        """
+        if not devices:
+            return
 
-            return device
+        try:
+            with self._join(connection, write=True) as txn:
+                for start in range(0, len(devices), batch_size):
+                    txn.execute(
+                        _UPSERT_DEVICE, devices[start : start + batch_size]
+                    )
+                self._mark_written(txn, (device["node_id"] for device in devices))
+            logger.debug(f"Guardados {len(devices)} dispositivos")
 
         except Exception as e:
-            session.rollback()
-            logger.error(f"Error guardando dispositivo: {e}")
+            logger.error(f"Error guardando dispositivos: {e}")
             raise
-        finally:
-            session.close()
 
-    def get_device(self, node_id: int) -> Optional[DeviceDB]:
+    def get_device(self, node_id: int) -> Optional[dict]:
         """
         Obtener un dispositivo por su node_id.
 
@@ -147,18 +575,42 @@ class Database:
             node_id: ID del nodo
 
         Returns:
-            DeviceDB o None si no existe
+            Diccionario con las columnas del dispositivo o None si no existe
         """
-        session = self.get_session()
-        try:
-            return session.query(DeviceDB).filter_by(node_id=node_id).first()
-        finally:
-            session.close()
+        cached = self._cached_row(node_id)
+        if cached is not None:
+            return cached
+
+        generation = self._row_cache.generation
+        with self.engine.connect() as connection:
+            row = connection.execute(_SELECT_DEVICE, {"node_id": node_id}).first()
+        if row is None:
+            return None
 
-    def get_all_devices(self) -> List[DeviceDB]:
+        device = dict(row._mapping)
+        self._cache_row(node_id, device, generation)
+        return dict(device)
+
+    def get_all_devices(self) -> List[DeviceRecord]:
         """
         Obtener todos los dispositivos.
 
+        Select Core leído en bloques de 256 filas (yield_per), sin crear
+        objetos ORM ni deserializar el estado de cada fila.
+
+        Returns:
+            Lista de dispositivos
+        """
+        with self.engine.connect() as connection:
+            return [
+                DeviceRecord(**row)
+                for row in connection.execute(_SELECT_ALL_DEVICES).mappings()
+            ]
+
+    def get_all_device_models(self) -> List[DeviceDB]:
+        """
+        Obtener todos los dispositivos como objetos ORM.
+
         Returns:
             Lista de dispositivos
         """
@@ -168,75 +620,294 @@ class Database:
         finally:
             session.close()
 
-    def delete_device(self, node_id: int) -> bool:
+    def delete_device(
+        self, node_id: int, connection: Optional[Connection] = None
+    ) -> bool:
         """
         Eliminar un dispositivo.
 
         Args:
             node_id: ID del nodo
+            connection: Transacción abierta con `transaction()` (opcional)
 
         Returns:
             True si se eliminó, False si no existía
         """
-        session = self.get_session()
         try:
-            device = session.query(DeviceDB).filter_by(node_id=node_id).first()
+            with self._join(connection, write=True) as txn:
+                result = txn.execute(_DELETE_DEVICE, {"node_id": node_id})
+                self._mark_written(txn, (node_id,))
 
-            if device:
-                session.delete(device)
-                session.commit()
+            if result.rowcount:
                 logger.info(f"Dispositivo {node_id} eliminado de DB")
                 return True
 
             return False
 
         except Exception as e:
-            session.rollback()
             logger.error(f"Error eliminando dispositivo: {e}")
             raise
-        finally:
-            session.close()
 
-    def update_device_state(self, node_id: int, state: dict):
+    def delete_devices(
+        self, node_ids: Iterable[int], connection: Optional[Connection] = None
+    ) -> int:
+        """
+        Eliminar varios dispositivos en una sola transacción.
+
+        Args:
+            node_ids: IDs de los nodos
+            connection: Transacción abierta con `transaction()` (opcional)
+
+        Returns:
+            Número de dispositivos eliminados
+        """
+        node_ids = list(node_ids)
+        if not node_ids:
+            return 0
+
+        try:
+            with self._join(connection, write=True) as txn:
+                result = txn.execute(
+                    _DELETE_DEVICE, [{"node_id": node_id} for node_id in node_ids]
+                )
+                self._mark_written(txn, node_ids)
+            return result.rowcount
+
+        except Exception as e:
+            logger.error(f"Error eliminando dispositivos: {e}")
+            raise
+
+    def update_device_state(
+        self, node_id: int, state: dict, connection: Optional[Connection] = None
+    ):
         """
         Actualizar solo el estado de un dispositivo.
 
         Args:
             node_id: ID del nodo
             state: Nuevo estado
+            connection: Transacción abierta con `transaction()` (opcional)
         """
-        session = self.get_session()
         try:
-            device = session.query(DeviceDB).filter_by(node_id=node_id).first()
+            with self._join(connection, write=True) as txn:
+                result = txn.execute(
+                    _UPDATE_DEVICE_STATE,
+                    {
+                        "target_node_id": node_id,
+                        "state": state,
+                    },
+                )
+                self._mark_written(txn, (node_id,))
 
-            if device:
-                device.state = json.dumps(state)
-                device.updated_at = datetime.utcnow()
-                session.commit()
-            else:
+            if result.rowcount == 0:
                 logger.warning(f"Dispositivo {node_id} no encontrado en DB")
 
         except Exception as e:
-            session.rollback()
             logger.error(f"Error actualizando estado: {e}")
             raise
-        finally:
-            session.close()
+
+    def update_device_states(
+        self, states: Dict[int, dict], connection: Optional[Connection] = None
+    ) -> int:
+        """
+        Actualizar el estado de varios dispositivos en una sola transacción.
+
+        Args:
+            states: Nuevo estado por node_id
+            connection: Transacción abierta con `transaction()` (opcional)
+
+        Returns:
+            Número de dispositivos actualizados (los que no existen en DB
+            no cuentan)
+        """
+        if not states:
+            return 0
+
+        try:
+            with self._join(connection, write=True) as txn:
+                result = txn.execute(
+                    _UPDATE_DEVICE_STATE,
+                    [
+                        {"target_node_id": node_id, "state": state}
+                        for node_id, state in states.items()
+                    ],
+                )
+                self._mark_written(txn, states.keys())
+            return result.rowcount
+
+        except Exception as e:
+            logger.error(f"Error actualizando estados: {e}")
+            raise
+
+    # ========== Operaciones async ==========
+
+    async def asave_devices(self, devices: List[dict], batch_size: int = 500):
+        """
+        Versión async de `save_devices`; no bloquea el event loop.
+
+        Args:
+            devices: Diccionarios con node_id, name, device_type, endpoint_id,
+                is_online y state (dict)
+            batch_size: Filas por executemany
+        """
+        if not devices:
+            return
+        if self.async_engine is None:
+            return await asyncio.to_thread(self.save_devices, devices, batch_size)
+
+        try:
+            async with self.async_write_engine.begin() as connection:
+                for start in range(0, len(devices), batch_size):
+                    await connection.execute(
+                        _UPSERT_DEVICE, devices[start : start + batch_size]
+                    )
+            self._forget_rows(device["node_id"] for device in devices)
+            logger.debug(f"Guardados {len(devices)} dispositivos")
+
+        except Exception as e:
+            logger.error(f"Error guardando dispositivos: {e}")
+            raise
+
+    async def adelete_devices(self, node_ids: Iterable[int]) -> int:
+        """
+        Versión async de `delete_devices`.
+
+        Args:
+            node_ids: IDs de los nodos
+
+        Returns:
+            Número de dispositivos eliminados
+        """
+        node_ids = list(node_ids)
+        if not node_ids:
+            return 0
+        if self.async_engine is None:
+            return await asyncio.to_thread(self.delete_devices, node_ids)
+
+        try:
+            async with self.async_write_engine.begin() as connection:
+                result = await connection.execute(
+                    _DELETE_DEVICE, [{"node_id": node_id} for node_id in node_ids]
+                )
+            self._forget_rows(node_ids)
+            return result.rowcount
+
+        except Exception as e:
+            logger.error(f"Error eliminando dispositivos: {e}")
+            raise
+
+    async def aget_device(self, node_id: int) -> Optional[dict]:
+        """
+        Versión async de `get_device`.
+
+        Args:
+            node_id: ID del nodo
+
+        Returns:
+            Diccionario con las columnas del dispositivo o None si no existe
+        """
+        if self.async_engine is None:
+            return await asyncio.to_thread(self.get_device, node_id)
+
+        cached = self._cached_row(node_id)
+        if cached is not None:
+            return cached
+
+        generation = self._row_cache.generation
+        async with self.async_engine.connect() as connection:
+            result = await connection.execute(_SELECT_DEVICE, {"node_id": node_id})
+            row = result.first()
+        if row is None:
+            return None
+
+        device = dict(row._mapping)
+        self._cache_row(node_id, device, generation)
+        return dict(device)
+
+    async def aupdate_device_state(self, node_id: int, state: dict):
+        """
+        Versión async de `update_device_state`.
+
+        Args:
+            node_id: ID del nodo
+            state: Nuevo estado
+        """
+        if self.async_engine is None:
+            return await asyncio.to_thread(self.update_device_state, node_id, state)
+
+        try:
+            async with self.async_write_engine.begin() as connection:
+                result = await connection.execute(
+                    _UPDATE_DEVICE_STATE,
+                    {
+                        "target_node_id": node_id,
+                        "state": state,
+                    },
+                )
+            self._forget_rows((node_id,))
+
+            if result.rowcount == 0:
+                logger.warning(f"Dispositivo {node_id} no encontrado en DB")
+
+        except Exception as e:
+            logger.error(f"Error actualizando estado: {e}")
+            raise
+
+    async def aupdate_device_states(self, states: Dict[int, dict]) -> int:
+        """
+        Versión async de `update_device_states`.
+
+        Args:
+            states: Nuevo estado por node_id
+
+        Returns:
+            Número de dispositivos actualizados
+        """
+        if not states:
+            return 0
+        if self.async_engine is None:
+            return await asyncio.to_thread(self.update_device_states, states)
+
+        try:
+            async with self.async_write_engine.begin() as connection:
+                result = await connection.execute(
+                    _UPDATE_DEVICE_STATE,
+                    [
+                        {"target_node_id": node_id, "state": state}
+                        for node_id, state in states.items()
+                    ],
+                )
+            self._forget_rows(states.keys())
+            return result.rowcount
+
+        except Exception as e:
+            logger.error(f"Error actualizando estados: {e}")
+            raise
 
     def close(self):
         """Cerrar conexiones de base de datos"""
         self.engine.dispose()
         logger.info("Base de datos cerrada")
 
+    async def aclose(self):
+        """Cerrar las conexiones de ambos engines (síncrono y async)"""
+        if self.async_engine is not None:
+            await self.async_engine.dispose()
+        self.close()
 
-# ========== Instancia global ==========
-# Se inicializará desde main.py
+
+# ========== Instancia de la aplicación ==========
+# Hay una única instancia para lecturas y escrituras: la separación en
+# instancias de lectura y escritura se descartó. main.py la crea con
+# init_database() y la pasa explícitamente al controlador y a la tarea de
+# mantenimiento; las rutas no acceden a la base de datos. La referencia de
+# módulo solo la usa el shim obsoleto `get_database()`.
 _database: Optional[Database] = None
 
 
 def init_database(db_path: str = "data/mattercenter.db") -> Database:
     """
-    Inicializar la base de datos global.
+    Crear la base de datos de la aplicación.
 
     Args:
         db_path: Ruta al archivo SQLite
@@ -251,7 +922,9 @@ def init_database(db_path: str = "data/mattercenter.db") -> Database:
 
 def get_database() -> Database:
     """
-    Obtener instancia de la base de datos.
+    Obtener la base de datos de la aplicación.
+
+    Obsoleto: recibe la Database como parámetro.
 
     Returns:
         Database
@@ -259,6 +932,11 @@ def get_database() -> Database:
     Raises:
         RuntimeError: Si la base de datos no está inicializada
     """
+    warnings.warn(
+        "get_database() está obsoleto; pasa la Database explícitamente",
+        DeprecationWarning,
+        stacklevel=2,
+    )
     if _database is None:
         raise RuntimeError("Database no inicializada. Llama a init_database() primero")
     return _database
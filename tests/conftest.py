@@ -0,0 +1,9 @@
+"""
+Configuración de pytest: los módulos de la aplicación se importan desde src/
+igual que al arrancar con `python src/main.py`.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
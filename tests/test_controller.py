@@ -0,0 +1,406 @@
+"""
+Tests del controlador Matter (matter.controller) sin Matter Server real
+"""
+
+import asyncio
+import json
+
+from matter.controller import Device, MatterController
+from storage.database import Database
+
+
+class FakeConnection:
+    """WebSocket falso: entrega los mensajes dados y termina la conexión."""
+
+    def __init__(self, controller: MatterController, messages):
+        self.controller = controller
+        self.messages = messages
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for message in self.messages:
+            yield message
+        # Fin de la conexión: que el lector salga en lugar de reconectar
+        self.controller._stopping = True
+
+
+class RespondingConnection:
+    """WebSocket falso: responde a cada comando con un resultado vacío."""
+
+    def __init__(self, controller: MatterController):
+        self.controller = controller
+        self.sent = []
+        self.replied = 0
+        # Respuestas ya entregadas cuando se escribió cada trama
+        self.replied_at_send = []
+
+    async def send(self, payload, text=False):
+        message = json.loads(payload)
+        self.sent.append(message)
+        self.replied_at_send.append(self.replied)
+        asyncio.get_running_loop().call_soon(self._reply, message["message_id"])
+
+    def _reply(self, message_id):
+        self.replied += 1
+        self.controller._dispatch_message({"message_id": message_id, "result": {}})
+
+
+def _dimmable_light(node_id: int) -> Device:
+    return Device(
+        node_id=node_id,
+        name="Luz",
+        device_type="dimmable_light",
+        state={"on": True, "brightness": 50, "brightness_raw": 127},
+    )
+
+
+def test_listener_survives_malformed_events():
+    async def scenario():
+        controller = MatterController(Database(":memory:"))
+        controller.devices[1] = Device(
+            node_id=1, name="Luz", device_type="light", state={"on": False}
+        )
+        controller.connection = FakeConnection(
+            controller,
+            [
+                b'{"event":"attribute_updated","data":[1,"1/6/0"]}',
+                b'{"event":"attribute_updated","data":null}',
+                b'{"event":"node_removed","data":"abc"}',
+                b"[1, 2, 3]",
+                b'{"event":"attribute_updated","data":[1,"1/6/0",true]}',
+            ],
+        )
+        await controller._listen_for_events()
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.devices[1].state["on"] is True
+
+
+def test_new_device_from_server_is_persisted(tmp_path):
+    database = Database(str(tmp_path / "mattercenter.db"))
+
+    async def scenario():
+        controller = MatterController(database)
+        writer = asyncio.create_task(controller._db_writer())
+        controller._dispatch_message(
+            {
+                "event": "node_added",
+                "data": {
+                    "node_id": 5,
+                    "available": True,
+                    "attributes": {"1/6/0": True, "0/40/14": "Bombilla"},
+                },
+            }
+        )
+        await controller._save_queue.join()
+        writer.cancel()
+        await database.async_engine.dispose()
+
+    try:
+        asyncio.run(scenario())
+        device = database.get_device(5)
+        assert device["name"] == "Bombilla"
+        assert device["state"] == {"on": True}
+    finally:
+        database.close()
+
+
+def test_batch_reports_invalid_level_per_item():
+    async def scenario():
+        controller = MatterController(Database(":memory:"))
+        controller.devices[1] = Device(
+            node_id=1, name="Luz", device_type="dimmable_light", state={}
+        )
+        return await controller.send_commands_batch(
+            [
+                (1, "level", {"level": "50"}),
+                (1, "level", {"level": None}),
+                (99, "on", {}),
+            ]
+        )
+
+    results = asyncio.run(scenario())
+    assert [result["success"] for result in results] == [False, False, False]
+
+
+def test_initialize_keeps_retrying_when_server_is_down():
+    import socket
+
+    from websockets.asyncio.server import serve
+
+    async def fake_matter_server(websocket):
+        async for raw_message in websocket:
+            message = json.loads(raw_message)
+            await websocket.send(
+                json.dumps({"message_id": message["message_id"], "result": []})
+            )
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    async def scenario():
+        controller = MatterController(Database(":memory:"))
+        controller.server_url = f"ws://127.0.0.1:{port}/ws"
+
+        await controller.initialize()
+        assert not controller.is_initialized
+
+        # El servidor arranca después: el controlador debe acabar conectado
+        async with serve(fake_matter_server, "127.0.0.1", port):
+            for _ in range(50):
+                if controller.is_initialized:
+                    break
+                await asyncio.sleep(0.1)
+            initialized = controller.is_initialized
+            await controller.shutdown()
+        return initialized
+
+    assert asyncio.run(scenario())
+
+
+def test_attribute_update_persists_device_type_change(tmp_path):
+    database = Database(str(tmp_path / "mattercenter.db"))
+
+    async def scenario():
+        controller = MatterController(database)
+        writer = asyncio.create_task(controller._db_writer())
+        controller._dispatch_message(
+            {"event": "node_added", "data": {"node_id": 3, "attributes": {}}}
+        )
+        await controller._save_queue.join()
+
+        controller._dispatch_message(
+            {"event": "attribute_updated", "data": [3, "1/8/0", 254]}
+        )
+        await controller._save_queue.join()
+        writer.cancel()
+        await database.async_engine.dispose()
+
+    try:
+        asyncio.run(scenario())
+        assert database.get_device(3)["device_type"] == "dimmable_light"
+    finally:
+        database.close()
+
+
+def _node(node_id: int, on: bool) -> dict:
+    return {
+        "node_id": node_id,
+        "available": True,
+        "attributes": {"1/6/0": on, "0/40/14": "Luz"},
+    }
+
+
+def test_state_writes_follow_event_order(tmp_path):
+    database = Database(str(tmp_path / "mattercenter.db"))
+
+    async def scenario():
+        controller = MatterController(database)
+        writer = asyncio.create_task(controller._db_writer())
+        controller._dispatch_message({"event": "node_added", "data": _node(1, False)})
+        await controller._save_queue.join()
+
+        controller._dispatch_message(
+            {"event": "attribute_updated", "data": [1, "1/6/0", True]}
+        )
+        controller._dispatch_message({"event": "node_updated", "data": _node(1, False)})
+        await controller._save_queue.join()
+        writer.cancel()
+        await database.async_engine.dispose()
+        return controller
+
+    try:
+        controller = asyncio.run(scenario())
+        assert controller.devices[1].state == {"on": False}
+        assert database.get_device(1)["state"] == {"on": False}
+    finally:
+        database.close()
+
+
+def test_failed_write_is_retried_with_current_state(tmp_path):
+    database = Database(str(tmp_path / "mattercenter.db"))
+
+    async def scenario():
+        controller = MatterController(database)
+        original = database.asave_devices
+        calls = []
+
+        async def flaky_save(rows):
+            calls.append(rows)
+            if len(calls) == 1:
+                # Mientras falla la escritura llega un estado más nuevo
+                controller._apply_attribute_update(1, "1/6/0", True)
+                raise RuntimeError("database is locked")
+            await original(rows)
+
+        database.asave_devices = flaky_save
+        writer = asyncio.create_task(controller._db_writer())
+        controller._dispatch_message({"event": "node_added", "data": _node(1, False)})
+        await controller._save_queue.join()
+        writer.cancel()
+        await database.async_engine.dispose()
+        return calls
+
+    try:
+        calls = asyncio.run(scenario())
+        assert len(calls) == 2
+        assert database.get_device(1)["state"] == {"on": True}
+    finally:
+        database.close()
+
+
+def test_initial_load_persists_every_device(tmp_path):
+    database = Database(str(tmp_path / "mattercenter.db"))
+    nodes = [_node(node_id, False) for node_id in range(1, 2001)]
+
+    async def scenario():
+        controller = MatterController(database)
+
+        async def get_nodes(command, **kwargs):
+            return {"result": nodes}
+
+        controller._send_and_wait_for_response = get_nodes
+        writer = asyncio.create_task(controller._db_writer())
+        await controller._load_initial_devices()
+        # Un solo encolado por nodo
+        assert controller._save_queue.qsize() == len(nodes)
+        await controller._save_queue.join()
+        writer.cancel()
+        await database.async_engine.dispose()
+
+    try:
+        asyncio.run(scenario())
+        assert len(database.get_all_devices()) == len(nodes)
+    finally:
+        database.close()
+
+
+def test_removed_and_stale_devices_are_deleted_from_database(tmp_path):
+    database = Database(str(tmp_path / "mattercenter.db"))
+
+    async def scenario():
+        controller = MatterController(database)
+
+        async def get_nodes(command, **kwargs):
+            return {"result": [_node(1, False)]}
+
+        controller._send_and_wait_for_response = get_nodes
+        writer = asyncio.create_task(controller._db_writer())
+        for node_id in (1, 2, 3):
+            controller._dispatch_message(
+                {"event": "node_added", "data": _node(node_id, False)}
+            )
+        await controller._save_queue.join()
+
+        controller._dispatch_message({"event": "node_removed", "data": 2})
+        # El nodo 3 ya no está en el servidor al resincronizar
+        await controller._load_initial_devices()
+        await controller._save_queue.join()
+        writer.cancel()
+        await database.async_engine.dispose()
+
+    try:
+        asyncio.run(scenario())
+        assert database.get_device(1) is not None
+        assert database.get_device(2) is None
+        assert database.get_device(3) is None
+    finally:
+        database.close()
+
+
+def test_resync_retries_until_it_succeeds():
+    async def scenario():
+        controller = MatterController(Database(":memory:"))
+        attempts = []
+
+        async def send_request(command, args=None, **kwargs):
+            return {}
+
+        async def sync_with_server():
+            attempts.append(len(attempts))
+            if len(attempts) == 1:
+                raise asyncio.TimeoutError()
+
+        controller._send_request = send_request
+        controller._sync_with_server = sync_with_server
+        await asyncio.wait_for(controller._resync(), timeout=5)
+        return controller, attempts
+
+    controller, attempts = asyncio.run(scenario())
+    assert len(attempts) == 2
+    assert controller.is_initialized
+
+
+def test_list_devices_tracks_added_and_removed_devices():
+    controller = MatterController(Database(":memory:"))
+    controller._dispatch_message({"event": "node_added", "data": _node(1, False)})
+    devices = controller.list_devices()
+    assert [device.node_id for device in devices] == [1]
+
+    # Un cambio de estado no reconstruye la tupla
+    controller._apply_attribute_update(1, "1/6/0", True)
+    assert controller.list_devices() is devices
+
+    controller._dispatch_message({"event": "node_added", "data": _node(2, False)})
+    controller._dispatch_message({"event": "node_removed", "data": 1})
+    assert [device.node_id for device in controller.list_devices()] == [2]
+
+
+def test_commands_matching_cached_state_are_not_sent():
+    async def scenario():
+        controller = MatterController(Database(":memory:"))
+        controller.devices[1] = _dimmable_light(1)
+        controller.connection = RespondingConnection(controller)
+        results = [
+            await controller.send_command(1, "on"),
+            # 50 % → 127, el brightness_raw en caché
+            await controller.send_command(1, "level", level=50),
+            await controller.send_command(1, "off"),
+        ]
+        return results, controller.connection.sent
+
+    results, sent = asyncio.run(scenario())
+    assert results == [{"noop": True}, {"noop": True}, {}]
+    assert [message["args"]["name"] for message in sent] == ["on_off.off"]
+
+
+def test_noop_coalescing_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("MATTER_COALESCE_NOOPS", "False")
+
+    async def scenario():
+        controller = MatterController(Database(":memory:"))
+        controller.devices[1] = _dimmable_light(1)
+        controller.connection = RespondingConnection(controller)
+        await controller.send_command(1, "on")
+        await controller.send_command(1, "level", level=50)
+        return controller.connection.sent
+
+    sent = asyncio.run(scenario())
+    assert len(sent) == 2
+
+
+def test_batch_writes_all_frames_before_waiting_for_replies():
+    async def scenario():
+        controller = MatterController(Database(":memory:"))
+        for node_id in (1, 2, 3):
+            controller.devices[node_id] = _dimmable_light(node_id)
+        controller.connection = RespondingConnection(controller)
+        results = await controller.send_commands_batch(
+            [(1, "off", {}), (2, "on", {}), (3, "level", {"level": 100})]
+        )
+        return results, controller
+
+    results, controller = asyncio.run(scenario())
+    assert results == [
+        {"node_id": 1, "success": True, "result": {}},
+        {"node_id": 2, "success": True, "result": {"noop": True}},
+        {"node_id": 3, "success": True, "result": {}},
+    ]
+    connection = controller.connection
+    assert [message["args"]["node_id"] for message in connection.sent] == [1, 3]
+    assert connection.replied_at_send == [0, 0]
+    assert controller._pending_commands == {}
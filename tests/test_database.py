@@ -0,0 +1,62 @@
+"""
+Tests de la persistencia de dispositivos (storage.database)
+"""
+
+import contextvars
+
+import pytest
+
+import storage.database
+from storage.database import Database, get_database, init_database
+
+
+def _save_light(db: Database, node_id: int = 1, on: bool = True):
+    db.save_device(
+        node_id=node_id,
+        name=f"Luz {node_id}",
+        device_type="light",
+        endpoint_id=1,
+        is_online=True,
+        state={"on": on},
+    )
+
+
+def test_reopen_existing_database(tmp_path):
+    """Abrir dos veces el mismo fichero no debe recrear los índices."""
+    db_path = str(tmp_path / "mattercenter.db")
+
+    db = Database(db_path)
+    _save_light(db)
+    db.close()
+
+    db = Database(db_path)
+    try:
+        device = db.get_device(1)
+        assert device["name"] == "Luz 1"
+        assert device["state"] == {"on": True}
+    finally:
+        db.close()
+
+
+def test_update_state_invalidates_cached_row(tmp_path):
+    db = Database(str(tmp_path / "mattercenter.db"))
+    try:
+        _save_light(db, on=True)
+        assert db.get_device(1)["state"] == {"on": True}
+
+        db.update_device_state(1, {"on": False})
+        assert db.get_device(1)["state"] == {"on": False}
+    finally:
+        db.close()
+
+
+def test_deprecated_get_database_outside_lifespan_context(tmp_path, monkeypatch):
+    """El shim debe funcionar también desde otro contexto (p. ej. una request)."""
+    monkeypatch.setattr(storage.database, "_database", None)
+    db = init_database(str(tmp_path / "mattercenter.db"))
+    try:
+        with pytest.warns(DeprecationWarning):
+            assert contextvars.Context().run(get_database) is db
+    finally:
+        db.close()
+
@@ -0,0 +1,36 @@
+"""
+Tests de las rutas de dispositivos (api.routes.devices)
+"""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes import devices
+from dependencies import get_controller
+from matter.controller import Device, MatterController
+from storage.database import Database
+
+
+def _client(controller: MatterController) -> TestClient:
+    app = FastAPI()
+    app.include_router(devices.router, prefix="/api/devices")
+
+    async def override_controller():
+        return controller
+
+    app.dependency_overrides[get_controller] = override_controller
+    return TestClient(app)
+
+
+def test_batch_without_matter_server_returns_503():
+    controller = MatterController(Database(":memory:"))
+    controller.devices[1] = Device(
+        node_id=1, name="Luz", device_type="light", state={"on": False}
+    )
+
+    response = _client(controller).post(
+        "/api/devices/commands:batch",
+        json={"items": [{"node_id": 1, "command": "on"}]},
+    )
+
+    assert response.status_code == 503